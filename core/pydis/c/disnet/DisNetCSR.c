@@ -0,0 +1,52 @@
+#include <math.h>
+#define real8 double
+
+/*---------------------------------------------------------------------------
+ *
+ *      Function:       FindUnbalancedNode
+ *      Description:    Scan the node-sorted arm arrays of a DisNet
+ *                      (as returned by DisNet.get_csr_data) and find the
+ *                      first node whose outgoing Burgers vectors do not
+ *                      sum to zero.
+ *
+ *      Arguments:
+ *          Nnode          number of nodes
+ *          indptr         arms of node i are stored in [indptr[i], indptr[i+1])
+ *          burgers        Burgers vectors of the arms, Narm x 3 (row major)
+ *          skip           if skip[i] is nonzero, node i is not checked
+ *          tol            tolerance on each component of the sum
+ *
+ *      Returns:        index of the first unbalanced node, or -1 if all
+ *                      checked nodes are balanced
+ *
+ *-------------------------------------------------------------------------*/
+int FindUnbalancedNode(int Nnode,
+                       int *indptr,
+                       real8 *burgers,
+                       int *skip,
+                       real8 tol )
+{
+        int   i, k;
+        real8 bx, by, bz;
+
+        for (i = 0; i < Nnode; i++) {
+
+            if (skip[i]) continue;
+
+            bx = 0.0;
+            by = 0.0;
+            bz = 0.0;
+
+            for (k = indptr[i]; k < indptr[i+1]; k++) {
+                bx += burgers[3*k  ];
+                by += burgers[3*k+1];
+                bz += burgers[3*k+2];
+            }
+
+            if ((fabs(bx) > tol) || (fabs(by) > tol) || (fabs(bz) > tol)) {
+                return(i);
+            }
+        }
+
+        return(-1);
+}
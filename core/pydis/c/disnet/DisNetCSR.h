@@ -0,0 +1,7 @@
+#define real8 double
+
+int FindUnbalancedNode(int Nnode,
+                       int *indptr,
+                       real8 *burgers,
+                       int *skip,
+                       real8 tol );
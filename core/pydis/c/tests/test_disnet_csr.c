@@ -0,0 +1,52 @@
+#include <stdio.h>
+#include "../disnet/DisNetCSR.h"
+
+/* square loop 0-1-2-3 with Burgers vector b = (1,2,3) plus an isolated pinned node 4,
+ * arms sorted by node as in DisNet.get_csr_data, burgers pointing out of each node */
+#define NNODE 5
+
+int indptr[NNODE+1] = {0, 2, 4, 6, 8, 9};
+real8 burgers[9*3] = {
+   1.0,  2.0,  3.0,   -1.0, -2.0, -3.0,   /* node 0 */
+  -1.0, -2.0, -3.0,    1.0,  2.0,  3.0,   /* node 1 */
+   1.0,  2.0,  3.0,   -1.0, -2.0, -3.0,   /* node 2 */
+  -1.0, -2.0, -3.0,    1.0,  2.0,  3.0,   /* node 3 */
+   0.0,  0.0,  1.0                        /* node 4 */
+};
+int skip[NNODE] = {0, 0, 0, 0, 1};
+
+int check(const char *name, int found, int expected)
+{
+  printf("%-40s FindUnbalancedNode = %2d (expected %2d)\n", name, found, expected);
+  return found == expected;
+}
+
+int main(){
+  int passed = 1;
+
+  passed &= check("balanced loop, pinned end skipped", FindUnbalancedNode(NNODE, indptr, burgers, skip, 1e-8), -1);
+
+  skip[4] = 0;
+  passed &= check("pinned end checked", FindUnbalancedNode(NNODE, indptr, burgers, skip, 1e-8), 4);
+  skip[4] = 1;
+
+  /* perturb one arm of node 2 below and above the tolerance */
+  burgers[3*5+1] += 1e-10;
+  passed &= check("perturbation below tolerance", FindUnbalancedNode(NNODE, indptr, burgers, skip, 1e-8), -1);
+  burgers[3*5+1] += 1e-6;
+  passed &= check("perturbation above tolerance", FindUnbalancedNode(NNODE, indptr, burgers, skip, 1e-8), 2);
+
+  /* the first unbalanced node is reported */
+  burgers[3*2+2] = 0.0;
+  passed &= check("two unbalanced nodes", FindUnbalancedNode(NNODE, indptr, burgers, skip, 1e-8), 1);
+
+  passed &= check("no nodes", FindUnbalancedNode(0, indptr, burgers, skip, 1e-8), -1);
+
+  if (passed) {
+    printf("test\033[32m PASSED\033[0m\n");
+  } else {
+    printf("test\033[31m FAILED\033[0m\n");
+  }
+
+  return passed ? 0 : 1;
+}
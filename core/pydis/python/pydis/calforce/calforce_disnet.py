@@ -152,7 +152,8 @@ class CalForce(CalForce_Base):
             tag1[i,:] = source
             tag2[i,:] = target
             burgers[i,:] = edge_attr.burg_vec_from(source).copy()
-            planes[i,:] = getattr(edge_attr, "plane_normal", np.zeros(3)).copy()
+            if edge_attr.plane_normal is not None:
+                planes[i,:] = edge_attr.plane_normal
             r1_local = G.nodes(source).R  # This line is different
             r2_local = G.nodes(target).R  # This line is different
             # apply PBC
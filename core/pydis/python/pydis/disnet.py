@@ -4,20 +4,49 @@ DisNet: class for dislocation network
 Implements basic topological operations on dislocation networks
 """
 
+import math
+import logging
 import numpy as np
+from collections import deque
 from .graph.graph import Graph, Node as Node_bare, Edge as Edge_bare
 from typing import Tuple
 from enum import IntEnum
 
 from framework.disnet_base import DisNet_Python
 
+try:
+    from .disnet_kernels import find_unbalanced_node as find_unbalanced_node_numba, sort_arms_by_node
+    found_numba = True
+except ImportError:
+    # use numpy version instead
+    found_numba = False
+
+try:
+    from .disnet_paradis import find_unbalanced_node_paradis, found_pydis
+except ImportError:
+    found_pydis = False
+
+logger = logging.getLogger(__name__)
+
 Tag = Tuple[int, int]
 
+def _pack_tag(domain: int, index: int) -> int:
+    """_pack_tag: pack a (domain, index) tag into a single int
+       packed tags compare in the same order as tuple tags, for index < 2**32
+    """
+    return (domain << 32) | index
+
+def _unpack_tag(key: int) -> Tag:
+    """_unpack_tag: inverse of _pack_tag
+    """
+    return (key >> 32, key & 0xffffffff)
+
 class DisNode():
     """DisNode: class for dislocation node (properties)
 
     Defines the basic attributes on a node
     """
+    __slots__ = ("R", "constraint")
 
     class Constraints(IntEnum):
         """Constraints: enum class for node constraints
@@ -45,12 +74,13 @@ class DisNode():
 
     def is_equivalent(self, other) -> bool:
         # check if all attributes in self have the same value in other
-        for key, value in vars(self).items():
+        for key in self.__slots__:
+            value = getattr(self, key)
             if type(value) == np.ndarray:
-                if not np.all(value == vars(other)[key]):
+                if not np.all(value == getattr(other, key)):
                     return False
             else:
-                if value != vars(other)[key]:
+                if value != getattr(other, key):
                     return False
         return True
 
@@ -60,21 +90,22 @@ class DisNode():
         return DisNode(R=self.R.copy(), constraint=self.constraint)
 
     def view(self):
-        """view: return a dictionary view of the node attr
+        """view: return a dictionary copy of the node attr, changes to it do not affect the node
         """
-        return vars(self)
+        return {key: getattr(self, key) for key in self.__slots__}
 
 class DisEdge():
     """DisEdge: class for dislocation edge (properties)
 
     Defines the basic features on a edge
     """
+    __slots__ = ("source_tag", "target_tag", "burg_vec", "plane_normal")
+
     def __init__(self, source_tag: Tag, target_tag: Tag, burg_vec: np.ndarray, plane_normal: np.ndarray=None) -> None:
         self.source_tag = source_tag
         self.target_tag = target_tag
         self.burg_vec = burg_vec
-        if plane_normal is not None:
-            self.plane_normal = plane_normal
+        self.plane_normal = plane_normal
 
     def burg_vec_from(self, from_tag: Tag) -> np.ndarray:
         if from_tag != self.source_tag and from_tag != self.target_tag:
@@ -96,12 +127,12 @@ class DisEdge():
         """
         return DisEdge(source_tag=self.source_tag, target_tag=self.target_tag,
                        burg_vec=self.burg_vec.copy(),
-                       plane_normal=self.plane_normal.copy() if hasattr(self, "plane_normal") else None)
+                       plane_normal=self.plane_normal.copy() if self.plane_normal is not None else None)
 
     def view(self):
-        """view: return a dictionary view of the edge attr
+        """view: return a dictionary copy of the edge attr, changes to it do not affect the edge
         """
-        return vars(self)
+        return {key: getattr(self, key) for key in self.__slots__}
 
 class Cell:
     """Cell: class for simulation cell in which dislocation network is embedded
@@ -168,7 +199,14 @@ class DisNet(DisNet_Python):
         # provide a reference from tags back to nodes (with attr)
         self.tags_to_nodes = {}
         self.cell = Cell() if cell is None else cell
-        self._recycled_tags = []
+        self._recycled_tags = deque()
+        # largest tag ever added (packed), so that get_new_tag does not scan all nodes
+        self._max_tag_key = -1
+        # incremented by every change of nodes or segments (not of node positions or attributes),
+        # the connectivity arrays of get_csr_data are cached until it changes
+        self._topo_version = 0
+        self._csr_cache = None
+        self._csr_version = -1
         if rn is not None or links is not None:
             self.add_nodes_segments_from_list(rn, links)
 
@@ -179,15 +217,16 @@ class DisNet(DisNet_Python):
         self._G.clear()
         self.tags_to_nodes.clear()
         self._recycled_tags.clear()
+        self._max_tag_key = -1
+        self._topo_version += 1
 
-    def neighbors_tags(self, tag: Tag):
-        """neighbors: return neighbor tags (as iterator) of a node
+    def neighbors_tags(self, tag: Tag) -> list:
+        """neighbors: return neighbor tags (as list) of a node
                       (not required in base class)
+           use get_csr_data(full=True) for neighbor indices as array slices
         """
-        connected_edges = self.tags_to_nodes[tag].edges()
-
-        return (edge.source.tag if edge.source.tag != tag else edge.target.tag
-                for edge in connected_edges)
+        return [edge.source.tag if edge.source.tag != tag else edge.target.tag
+                for edge in self.tags_to_nodes[tag].edges()]
 
     def neighbors_dict(self, tag: Tag):
         """neighbors_dict: return neighbor tags and attributes of a node
@@ -270,7 +309,11 @@ class DisNet(DisNet_Python):
     def pos_array(self) -> np.ndarray:
         """pos_array: return a numpy array of node positions
         """
-        return np.array([node.attr.R for node in self.tags_to_nodes.values()])
+        Nnode = len(self.tags_to_nodes)
+        if Nnode == 0:
+            return np.zeros((0, 3))
+        # one flat concatenation is cheaper than np.array on a list of small arrays
+        return np.concatenate([node.attr.R for node in self.tags_to_nodes.values()]).astype(float, copy=False).reshape(Nnode, 3)
 
     # To do: remove function node_prop_list (after removed from base class)
     def node_prop_list(self) -> list:
@@ -291,38 +334,22 @@ class DisNet(DisNet_Python):
                 ntags: position of each tag in the nodes array
         """
         Nnode = self.num_nodes()
-        tags = np.zeros((Nnode, 2), dtype=int)
-        R = np.zeros((Nnode, 3))
-        constraints = np.zeros((Nnode, 1), dtype=int)
-        ntags = {}
-        i = 0
-        for tag, node_attr in self.all_nodes_mapping():
-            tags[i,:] = tag
-            R[i,:] = node_attr.R
-            constraints[i,:] = node_attr.constraint
-            ntags[tag] = i
-            i += 1
+        ntags = {tag: i for i, tag in enumerate(self.tags_to_nodes)}
+        tags = np.array(list(ntags), dtype=int).reshape(Nnode, 2)
+        constraints = np.fromiter((node.attr.constraint for node in self.tags_to_nodes.values()),
+                                  dtype=int, count=Nnode).reshape(Nnode, 1)
         return {
             "tags": tags,
-            "positions": R,
+            "positions": self.pos_array(),
             "constraints": constraints
         }, ntags
 
     def get_segs_data(self, ntags: dict):
         """get_segs_data: collect segments data into a dictionary format
         """
-        Nseg = self.num_segments()
-        nodeids = np.zeros((Nseg, 2), dtype=int)
-        burgers = np.zeros((Nseg, 3))
-        planes = np.zeros((Nseg, 3))
-        i = 0
-        for (source, target), edge_attr in self.all_segments_dict().items():
-            nodeids[i,:] = ntags[source], ntags[target]
-            burgers[i,:] = edge_attr.burg_vec_from(source)
-            planes[i,:] = edge_attr.plane_normal
-            i += 1
+        source, target, burgers, planes = self._collect_segs(ntags)
         return {
-            "nodeids": nodeids,
+            "nodeids": np.column_stack((source, target)),
             "burgers": burgers,
             "planes": planes
         }
@@ -330,39 +357,109 @@ class DisNet(DisNet_Python):
     def get_segs_data_with_positions(self):
         """get_segs_data_with_positions: collect segments data into a dictionary format
         """
-        _, ntags = self.get_nodes_data()
-        Nseg = self.num_segments()
-        nodeids = np.zeros((Nseg, 2), dtype=int)
-        tag1 = np.zeros((Nseg, 2), dtype=int)
-        tag2 = np.zeros((Nseg, 2), dtype=int)
-        burgers = np.zeros((Nseg, 3))
-        planes = np.zeros((Nseg, 3))
-        R1 = np.zeros((Nseg, 3))
-        R2 = np.zeros((Nseg, 3))
-        i = 0
-        for (source, target), edge_attr in self.all_segments_dict().items():
-            nodeids[i,:] = ntags[source], ntags[target]
-            tag1[i,:] = source
-            tag2[i,:] = target
-            burgers[i,:] = edge_attr.burg_vec_from(source).copy()
-            planes[i,:] = getattr(edge_attr, "plane_normal", np.zeros(3)).copy()
-            r1_local = self.nodes(source).R
-            r2_local = self.nodes(target).R
-            # apply PBC
-            r2_local = self.cell.closest_image(Rref=r1_local, R=r2_local)
-            R1[i,:] = r1_local
-            R2[i,:] = r2_local
-            i += 1
+        nodes_data, ntags = self.get_nodes_data()
+        source, target, burgers, planes = self._collect_segs(ntags)
+        tags = nodes_data["tags"]
+        R = nodes_data["positions"]
+        R1 = R[source]
+        # apply PBC
+        R2 = self.cell.closest_image(Rref=R1, R=R[target])
         return {
-            "nodeids": nodeids,
-            "tag1": tag1,
-            "tag2": tag2,
+            "nodeids": np.column_stack((source, target)),
+            "tag1": tags[source],
+            "tag2": tags[target],
             "burgers": burgers,
             "planes":  planes,
             "R1": R1,
             "R2": R2
         }
 
+    def _collect_segs(self, ntags: dict, with_planes: bool=True):
+        """_collect_segs: collect node indices of both ends, Burgers vector (from source to target)
+           and plane normal of all segments into arrays
+           if ntags is None, node indices are not collected and None is returned for them
+           if with_planes == False, plane normals are not collected and None is returned for them
+        """
+        Nseg = self.num_segments()
+        source = np.zeros(Nseg, dtype=int)
+        target = np.zeros(Nseg, dtype=int)
+        burgers = np.zeros((Nseg, 3))
+        planes = np.zeros((Nseg, 3)) if with_planes else None
+        flip = np.zeros(Nseg, dtype=bool)
+        for i, edge in enumerate(self._G.edges()):
+            source_tag, attr = edge.source.tag, edge.attr
+            if ntags is not None:
+                source[i] = ntags[source_tag]
+                target[i] = ntags[edge.target.tag]
+            # copy stored vectors as is and fix the orientation in one pass below,
+            # rather than allocating a negated vector per segment in burg_vec_from
+            burgers[i,:] = attr.burg_vec
+            flip[i] = attr.source_tag != source_tag
+            if with_planes and attr.plane_normal is not None:
+                planes[i,:] = attr.plane_normal
+        burgers[flip] *= -1.0
+        if ntags is None:
+            return None, None, burgers, planes
+        return source, target, burgers, planes
+
+    def get_csr_data(self, full: bool=False):
+        """get_csr_data: collect network connectivity into compressed sparse row (CSR) arrays
+           Returns:
+                csr_data: dictionary of structure-of-arrays data
+                    tags:    (Nnode, 2) tag of each node
+                    indptr:  (Nnode+1,) arms of node i are stored in [indptr[i], indptr[i+1])
+                    burgers: (2*Nseg, 3) Burgers vector of each arm, pointing out of its node
+                  and if full == True
+                    indices: (2*Nseg,) node index of the neighbor at the end of each arm
+                    seg:     (2*Nseg,) segment index of each arm
+                    rev:     (2*Nseg,) index of the opposite arm of the same segment
+                    planes:  (2*Nseg, 3) glide plane normal of each arm
+                ntags: position of each tag in the nodes array
+           The connectivity arrays (tags, indptr, indices, seg, rev) and ntags are cached until
+           nodes or segments are added, removed or combined, and must be treated as read-only
+           Burgers vectors and plane normals are collected again at every call
+        """
+        if self._csr_version != self._topo_version:
+            ntags = {tag: i for i, tag in enumerate(self.tags_to_nodes)}
+            Nnode = len(ntags)
+            tags = np.array(list(ntags), dtype=int).reshape(Nnode, 2)
+            source, target, burgers, planes = self._collect_segs(ntags, with_planes=full)
+
+            # each segment contributes one arm to each of its two end nodes
+            arm_node = np.concatenate((source, target))
+            if found_numba:
+                indptr, order = sort_arms_by_node(arm_node, Nnode)
+            else:
+                order = np.argsort(arm_node, kind="stable")
+                indptr = np.zeros(Nnode+1, dtype=int)
+                indptr[1:] = np.cumsum(np.bincount(arm_node, minlength=Nnode))
+            # indices, seg and rev are only built when first requested
+            self._csr_cache = ({"tags": tags, "indptr": indptr}, ntags, order, arm_node)
+            self._csr_version = self._topo_version
+        else:
+            _, _, burgers, planes = self._collect_segs(None, with_planes=full)
+        connectivity, ntags, order, arm_node = self._csr_cache
+
+        csr_data = {
+            "tags": connectivity["tags"],
+            "indptr": connectivity["indptr"],
+            "burgers": np.concatenate((burgers, -burgers))[order]
+        }
+        if full:
+            if "rev" not in connectivity:
+                Nseg = order.size // 2
+                # arms k and k+Nseg (before sorting) belong to the same segment
+                position = np.empty(2*Nseg, dtype=int)
+                position[order] = np.arange(2*Nseg)
+                connectivity["indices"] = np.concatenate((arm_node[Nseg:], arm_node[:Nseg]))[order]
+                connectivity["seg"] = np.concatenate((np.arange(Nseg), np.arange(Nseg)))[order]
+                connectivity["rev"] = position[(order + Nseg) % max(2*Nseg, 1)]
+            csr_data["indices"] = connectivity["indices"]
+            csr_data["seg"] = connectivity["seg"]
+            csr_data["rev"] = connectivity["rev"]
+            csr_data["planes"] = np.concatenate((planes, planes))[order]
+        return csr_data, ntags
+
     def export_data(self):
         """export_data: export network to data
         """
@@ -372,8 +469,9 @@ class DisNet(DisNet_Python):
         data = {"cell": cell, "nodes": nodes_data, "segs": segs_data}
         return data
     
-    def import_data(self, data):
+    def import_data(self, data, validate: bool=True):
         """import_data: import network from data
+           validate=False skips the sanity check of the imported network
         """
         cell = data.get("cell")
         self.cell = Cell(h=cell.get("h"), origin=cell.get("origin"), is_periodic=cell.get("is_periodic"))
@@ -382,17 +480,22 @@ class DisNet(DisNet_Python):
         nodes_array = np.hstack((nodes_data["tags"], nodes_data["positions"], nodes_data["constraints"]))
         segs_data = data.get("segs")
         segs_array = np.hstack((segs_data["nodeids"], segs_data["burgers"], segs_data["planes"]))
-        self.add_nodes_segments_from_list(nodes_array, segs_array)
+        self.add_nodes_segments_from_list(nodes_array, segs_array, validate=validate)
 
     def copy(self):
         """copy: return a deep copy of the network
         """
         result = DisNet(cell=self.cell.copy())
-        for tag, node_attr in self.all_nodes_mapping():
-            result._add_node(tag, node_attr.copy())
+        # self is known to be consistent, so skip the per-item checks of _add_node/_add_edge
+        nodes = result.tags_to_nodes
+        for tag, node in self.tags_to_nodes.items():
+            nodes[tag] = result.Node_with_attr(tag, node.attr.copy())
+            result._G.add_node(nodes[tag])
 
-        for (source, target), edge_attr in self.all_segments_dict().items():
-            result._add_edge(source, target, edge_attr.copy())
+        for edge in self._G.edges():
+            result._G.add_edge(result.Edge_with_attr(nodes[edge.source.tag], nodes[edge.target.tag], edge.attr.copy()))
+        result._topo_version += 1
+        result._max_tag_key = self._max_tag_key
 
         return result
 
@@ -403,18 +506,17 @@ class DisNet(DisNet_Python):
         import networkx as nx
         nx_graph = nx.DiGraph()
         for tag, node in self.all_nodes_mapping():
-            nx_graph.add_node(tag, **vars(node))
-
-        for (source, target), edge_attr in self.all_segments_dict().items():
-            edge_dict = vars(edge_attr.copy())
-            del edge_dict["source_tag"]
-            edge_dict["burg_vec"] = edge_attr.burg_vec_from(source)
-            nx_graph.add_edge(source, target, **edge_dict)
-
-            edge_dict = vars(edge_attr.copy())
-            del edge_dict["source_tag"]
-            edge_dict["burg_vec"] = edge_attr.burg_vec_from(target)
-            nx_graph.add_edge(target, source, **edge_dict)
+            nx_graph.add_node(tag, **node.view())
+
+        for (source, target), edge_attr in self.all_segments_mapping():
+            # build the attribute dicts directly instead of copying the DisEdge object
+            plane_normal = edge_attr.plane_normal
+            for tag1, tag2 in ((source, target), (target, source)):
+                edge_dict = {"target_tag": edge_attr.target_tag,
+                             "burg_vec": edge_attr.burg_vec_from(tag1).copy()}
+                if plane_normal is not None:
+                    edge_dict["plane_normal"] = plane_normal.copy()
+                nx_graph.add_edge(tag1, tag2, **edge_dict)
 
         return nx_graph
 
@@ -437,8 +539,9 @@ class DisNet(DisNet_Python):
         for tag, node in self.all_nodes_mapping():
             if not node.is_equivalent(G_compare.nodes(tag)):
                 return False
-        for (source, target), edge_attr in self.all_segments_dict().items():
-            if not edge_attr.is_equivalent(G_compare.segments((source, target))):
+        # each segment is stored once, so every pair of nodes is compared once
+        for edge in self._G.edges():
+            if not edge.attr.is_equivalent(G_compare.segments((edge.source.tag, edge.target.tag))):
                 return False
         return True
 
@@ -467,6 +570,8 @@ class DisNet(DisNet_Python):
         node = self.Node_with_attr(tag, node_attr)
         self.tags_to_nodes[tag] = node
         self._G.add_node(node)
+        self._max_tag_key = max(self._max_tag_key, _pack_tag(*tag))
+        self._topo_version += 1
     
     def _add_edge(self, tag1: Tag, tag2: Tag, edge_attr: DisEdge) -> None:
         """add_edge: add an edge to the network
@@ -474,12 +579,16 @@ class DisNet(DisNet_Python):
         """
         if self.has_segment(tag1, tag2):
             raise ValueError("_add_edge: Edge (%s, %s) already exists" % (str(tag1), str(tag2)))
+        # checked once here so that is_sane does not need to re-walk all edges for it
+        if edge_attr.source_tag != tag1 and edge_attr.source_tag != tag2:
+            raise ValueError("_add_edge: source_tag %s is not in link (%s, %s)" % (str(edge_attr.source_tag), str(tag1), str(tag2)))
 
         node1 = self.tags_to_nodes[tag1]
         node2 = self.tags_to_nodes[tag2]
 
         edge = self.Edge_with_attr(node1, node2, edge_attr)
         self._G.add_edge(edge)
+        self._topo_version += 1
 
     def _remove_node(self, tag: Tag) -> None:
         """remove_edge: remove a node from the network
@@ -488,6 +597,7 @@ class DisNet(DisNet_Python):
         node = self.tags_to_nodes.pop(tag)
         self._G.remove_node(node)
         self._recycled_tags.append(tag)
+        self._topo_version += 1
 
     def _remove_edge(self, tag1: Tag, tag2: Tag) -> None:
         """remove_edge: remove an edge from the network
@@ -497,56 +607,71 @@ class DisNet(DisNet_Python):
         node2 = self.tags_to_nodes[tag2]
         edge = self._G.edge_between(node1, node2)
         self._G.remove_edge(edge)
+        self._topo_version += 1
 
     def _combine_edge(self, tag1: Tag, tag2: Tag, edge_attr: DisEdge) -> None:
         """combine_edge: combine an edge with an existing edge
            user is not supposed to call this low level function, does not guarantee sanity
         """
-        if not self.has_segment(tag1, tag2):
+        node1 = self.tags_to_nodes[tag1]
+        node2 = self.tags_to_nodes[tag2]
+        if not self._G.has_edge_between(node1, node2):
             self._add_edge(tag1, tag2, edge_attr)
             return
 
-        node1 = self.tags_to_nodes[tag1]
-        node2 = self.tags_to_nodes[tag2]
         self._G.edge_between(node1, node2).attr.add(edge_attr)
+        self._topo_version += 1
 
-    def add_nodes_segments_from_list(self, rn, links) -> None:
+    def add_nodes_segments_from_list(self, rn, links, validate: bool=True) -> None:
         """add_nodes_segments_from_list: add nodes and edges stored in lists to network
            sanity after this operation depends on the input
+           validate=False skips the final is_sane check, e.g. when restarting from data
+           that has already been checked
         """
         N = rn.shape[0]
+        # collect tags and attributes for all nodes at once
+        if rn.shape[1] == 6:
+            tags = [tuple(tag) for tag in rn[:,0:2].astype(int).tolist()]
+            R = rn[:,2:5].copy()
+            constraints = rn[:,5].astype(int).tolist()
+        elif rn.shape[1] == 4:
+            tags = [(0, i) for i in range(N)]
+            R = rn[:,:3].copy()
+            constraints = rn[:,3].astype(int).tolist()
+        elif rn.shape[1] == 3:
+            tags = [(0, i) for i in range(N)]
+            R = rn[:,:3].copy()
+            constraints = [DisNode.Constraints.UNCONSTRAINED] * N
+        else:
+            raise ValueError("add_nodes_segments_from_list: invalid node format")
         num_links = links.shape[0]
-        for i in range(N):
-            if rn.shape[1] == 6:
-                tag = (int(rn[i,0]), int(rn[i,1]))
-                node = DisNode(R=rn[i,2:5].copy(), constraint=int(rn[i,5]))
-            elif rn.shape[1] == 4:
-                tag = (0, i)
-                node = DisNode(R=rn[i,:3].copy(), constraint=int(rn[i,3]))
-            elif rn.shape[1] == 3:
-                tag = (0, i)
-                node = DisNode(R=rn[i,:3].copy())
-            else:
-                raise ValueError("add_nodes_segments_from_list: invalid node format")
-            self._add_node(tag, node)
-        for j in range(num_links):
-            seg = links[j, :2].astype(int)
-            bv  = links[j, 2:5]
-            if rn.shape[1] == 6:
-                tag = (int(rn[int(seg[0]),0]), int(rn[int(seg[0]),1]))
-                nbr_tag = (int(rn[int(seg[1]),0]), int(rn[int(seg[1]),1]))
-            elif rn.shape[1] == 4 or rn.shape[1] == 3:
-                tag = (0,seg[0])
-                nbr_tag = (0, seg[1])
-            if links.shape[1] > 5:
-                pn  = links[j, 5:8]
-                # Note: now we add edges only once
-                self._add_edge(tag, nbr_tag, DisEdge(tag, nbr_tag, burg_vec=bv.copy(), plane_normal=pn.copy()))
-            else:
-                # Note: now we add edges only once
-                self._add_edge(tag, nbr_tag, DisEdge(tag, nbr_tag, burg_vec=bv.copy()))
-
-        if not self.is_sane():
+        seg = links[:,0:2].astype(int)
+        burgers = links[:,2:5].copy()
+        planes = links[:,5:8].copy() if links.shape[1] > 5 else [None] * num_links
+
+        # check the whole input once, instead of per node and per segment in _add_node/_add_edge
+        if len(set(tags)) != N or not self.tags_to_nodes.keys().isdisjoint(tags):
+            raise ValueError("add_nodes_segments_from_list: node tags are duplicated or already exist")
+        # segment ends are used as list indices below, where negative values would wrap around
+        if num_links > 0 and (seg.min() < 0 or seg.max() >= N):
+            raise ValueError("add_nodes_segments_from_list: segment refers to a node index out of range [0, %d)" % N)
+        # all segments connect new nodes, so they can only duplicate each other
+        if np.unique(np.sort(seg, axis=1), axis=0).shape[0] != num_links:
+            raise ValueError("add_nodes_segments_from_list: duplicated segments")
+
+        nodes = [self.Node_with_attr(tag, DisNode(R=R_i, constraint=constraint))
+                 for tag, R_i, constraint in zip(tags, R, constraints)]
+        for node in nodes:
+            self.tags_to_nodes[node.tag] = node
+            self._G.add_node(node)
+        if N > 0:
+            self._max_tag_key = max(self._max_tag_key, max(_pack_tag(*tag) for tag in tags))
+        for (i, j), bv, pn in zip(seg.tolist(), burgers, planes):
+            # Note: now we add edges only once
+            self._G.add_edge(self.Edge_with_attr(nodes[i], nodes[j], DisEdge(tags[i], tags[j], burg_vec=bv, plane_normal=pn)))
+        self._topo_version += 1
+
+        if validate and not self.is_sane():
             raise ValueError("add_nodes_segments_from_list: sanity check failed")
     
     def get_new_tag(self, recycle = True) -> Tag:
@@ -555,13 +680,15 @@ class DisNet(DisNet_Python):
            recycle == False makes it easier to debug as node tags are never reused
         """
         if recycle and len(self._recycled_tags) > 0:
-            return self._recycled_tags.pop(0)
+            return self._recycled_tags.popleft()
+        elif self._max_tag_key < 0:
+            return (0, 0)
         else:
-            max_tag = max(self.all_nodes_tags())
-            return (max_tag[0], max_tag[1]+1)
+            domain, index = _unpack_tag(self._max_tag_key)
+            return (domain, index+1)
 
     def insert_node(self, tag1: Tag, tag2: Tag, new_tag: Tag, R: np.ndarray) -> None:
-        insert_node_between(tag1, tag2, new_tag, R)
+        self.insert_node_between(tag1, tag2, new_tag, R)
 
     def insert_node_between(self, tag1: Tag, tag2: Tag, new_tag: Tag, R: np.ndarray) -> None:
         """insert_node_between: insert a node between two existing nodes
@@ -569,12 +696,18 @@ class DisNet(DisNet_Python):
         """
         # To do: update plastic strain if new node position is not on segment
         self._add_node(new_tag, DisNode(R=R.copy()))
-        prev_edge_attr = self.segments((tag1, tag2))
-        new_edge_attr = DisEdge(tag1, new_tag, prev_edge_attr.burg_vec_from(tag1).copy(), prev_edge_attr.plane_normal.copy())
-        self._add_edge(tag1, new_tag, new_edge_attr)
+        prev_edge = self._G.edge_between(self.tags_to_nodes[tag1], self.tags_to_nodes[tag2])
+        self._G.remove_edge(prev_edge)
+        self._topo_version += 1
+        prev_edge_attr = prev_edge.attr
         new_edge_attr = DisEdge(tag2, new_tag, prev_edge_attr.burg_vec_from(tag2).copy(), prev_edge_attr.plane_normal.copy())
+        # reuse the attributes of the removed segment for the new segment on the side of tag1
+        if prev_edge_attr.source_tag == tag2:
+            prev_edge_attr.source_tag = new_tag
+        else:
+            prev_edge_attr.target_tag = new_tag
+        self._add_edge(tag1, new_tag, prev_edge_attr)
         self._add_edge(new_tag, tag2, new_edge_attr)
-        self._remove_edge(tag1, tag2)
     
     def remove_two_arm_node(self, old_tag: Tag) -> None:
         """remove_two_arm_node: remove a node with two arms from the network
@@ -587,10 +720,12 @@ class DisNet(DisNet_Python):
 
         # To do: update plastic strain due to removed node operation
 
-        tag1, tag2 = self.neighbors_tags(old_tag)
-        end_nodes_connected = self.has_segment(tag1, tag2)
+        # take both arms directly from the node instead of looking them up by tag pair
+        edge1, edge2 = self.tags_to_nodes[old_tag].edges()
+        tag1 = edge1.source.tag if edge1.source.tag != old_tag else edge1.target.tag
+        tag2 = edge2.source.tag if edge2.source.tag != old_tag else edge2.target.tag
 
-        prev_link_attr = self.segments((old_tag, tag2))
+        prev_link_attr = edge2.attr
         new_link_attr = DisEdge(tag2, tag1, prev_link_attr.burg_vec_from(tag2).copy(), prev_link_attr.plane_normal.copy())
         self._combine_edge(tag1, tag2, new_link_attr)
         self._remove_node(old_tag)
@@ -608,22 +743,26 @@ class DisNet(DisNet_Python):
         if not self.has_node(tag):
             return
 
-        nbr_list = list(self.neighbors_tags(tag))
         node = self.tags_to_nodes[tag]
         edges_to_remove = []
         for edge in node.edges():
-            bv = edge.attr.burg_vec_from(tag)
-            if np.max(np.abs(bv)) < tol:
+            # the sign does not matter here, so use the stored vector and compare scalars
+            b0, b1, b2 = edge.attr.burg_vec.tolist()
+            if abs(b0) < tol and abs(b1) < tol and abs(b2) < tol:
                 edges_to_remove.append(edge)
+        # only neighbors that lost an arm can have become orphaned
+        touched_nbrs = []
         for edge in edges_to_remove:
+            touched_nbrs.append(edge.source if edge.source is not node else edge.target)
             self._G.remove_edge(edge)
+            self._topo_version += 1
 
         if node.num_neighbors() == 0:
             self._remove_node(node.tag)
 
-        for nbr_tag in nbr_list:
-            if self.out_degree(nbr_tag) == 0:
-                self._remove_node(nbr_tag)
+        for nbr in touched_nbrs:
+            if nbr.num_neighbors() == 0:
+                self._remove_node(nbr.tag)
 
     def merge_node(self, tag1: Tag, tag2: Tag):
         """merge_node: merge two nodes into one
@@ -649,13 +788,20 @@ class DisNet(DisNet_Python):
         # To do: update plastic strain due to merged node operation
 
         # Remove any links between targetNode and deadNode
-        if self.has_segment(targetNode, deadNode):
-            self._remove_edge(targetNode, deadNode)
+        # (walk the arms of deadNode once, instead of looking them up by tag pair)
+        nbr_arms = []
+        for edge in list(self.tags_to_nodes[deadNode].edges()):
+            nbr_tag = edge.source.tag if edge.source.tag != deadNode else edge.target.tag
+            if nbr_tag == targetNode:
+                self._G.remove_edge(edge)
+                self._topo_version += 1
+            else:
+                nbr_arms.append((nbr_tag, edge.attr))
 
         # Move all connections from the dead node to the target node
         # and add a new connection from the target node to each of the
         # dead node's neighbors.
-        for nbr_tag, link_attr in self.neighbor_segments_dict(deadNode).items():
+        for nbr_tag, link_attr in nbr_arms:
             new_link_attr = DisEdge(nbr_tag, targetNode, link_attr.burg_vec_from(nbr_tag).copy(), link_attr.plane_normal.copy())
             self._combine_edge(targetNode, nbr_tag, new_link_attr)
 
@@ -678,14 +824,20 @@ class DisNet(DisNet_Python):
         """find_precise_glide_plane: find glide plane normal given burgers vector and line direction
         """
         # following ParaDiS FindPreciseGlidePlane.c
-        if np.dot(dirv, dirv) < 1e-8:
+        # work on scalars, numpy calls on 3-vectors cost more than the arithmetic
+        b0, b1, b2 = np.asarray(bv, dtype=float).tolist()
+        d0, d1, d2 = np.asarray(dirv, dtype=float).tolist()
+        dd = d0*d0 + d1*d1 + d2*d2
+        bb = b0*b0 + b1*b1 + b2*b2
+        if dd < 1e-8 or bb == 0.0:
             return np.zeros(3)
 
-        if np.square(np.dot(bv, dirv)) / (np.dot(bv, bv)*np.dot(dirv, dirv)) > dot_cutoff:
+        bd = b0*d0 + b1*d1 + b2*d2
+        if bd*bd / (bb*dd) > dot_cutoff:
             return np.zeros(3)
 
-        pn = np.cross(bv, dirv)
-        pn /= np.linalg.norm(pn)
+        n0, n1, n2 = b1*d2 - b2*d1, b2*d0 - b0*d2, b0*d1 - b1*d0
+        pn = np.array([n0, n1, n2]) / math.sqrt(n0*n0 + n1*n1 + n2*n2)
 
         # To do: implement geometries based on FCC or BCC slip systems
 
@@ -710,89 +862,117 @@ class DisNet(DisNet_Python):
         self.nodes(split_node1).R = pos1.copy()
 
         bv = np.zeros(3)
+        node = self.tags_to_nodes[tag]
         for nbr in nbrs_to_split:
-            if not self.has_segment(tag, nbr):
+            # look up each arm once and remove it through the edge object
+            nbr_node = self.tags_to_nodes.get(nbr, None)
+            if nbr_node is None or not self._G.has_edge_between(node, nbr_node):
                 raise ValueError("split_node: Node %s and %s are not connected" % (str(tag), str(nbr)))
 
-            link_attr = self.segments((tag, nbr))
+            edge = self._G.edge_between(node, nbr_node)
+            link_attr = edge.attr
             new_link_attr = DisEdge(nbr, split_node2, link_attr.burg_vec_from(nbr).copy(), link_attr.plane_normal.copy())
             self._add_edge(split_node2, nbr, new_link_attr)
             bv += link_attr.burg_vec_from(tag)
 
-            self._remove_edge(tag, nbr)
+            self._G.remove_edge(edge)
+            self._topo_version += 1
 
         # ParadiS calls AssignNodeToCell here
 
         # possibly adding a link between split_node1 and split_node2
-        if np.inner(bv, bv) > eps_b:
+        if bv @ bv > eps_b:
             dirv = pos2 - pos1
             # To do: apply PBC
 
             # To do: move two nodes apart along their velocity
 
-            if np.inner(dirv, dirv) < eps_b:
+            dd = dirv @ dirv
+            if dd < eps_b:
                 dirv = np.array([0.0, 0.0, 0.0])
             else:
-                dirv = dirv / np.linalg.norm(dirv)
+                dirv = dirv / math.sqrt(dd)
             pn = self.find_precise_glide_plane(bv, dirv)
 
             self._add_edge(split_node1, split_node2, DisEdge(split_node1, split_node2, burg_vec=bv.copy(), plane_normal=pn.copy()))
 
-        #print("split_node: original tag = %s -> new tags = %s, %s, bv = %s" % (str(tag), str(split_node1), str(split_node2)))
+        logger.debug("split_node: original tag = %s -> new tags = %s, %s, bv = %s", tag, split_node1, split_node2, bv)
         return split_node1, split_node2
 
-    def is_sane(self, tol: float=1e-8) -> bool:
+    def is_sane(self, tol: float=1e-8, strict: bool=False) -> bool:
         """is_sane: check if the network is sane
            guarantees sanity after operation
 
         The two arms connecting two nodes should have opposite Burgers vectors and parallel plane_normal vectors
         The sum of all Burgers vectors of outgoing arms from a node should be zero
-        """
-        for (source, target), edge_attr in self.all_segments_dict().items():
-            if edge_attr.source_tag != source and edge_attr.source_tag != target:
-                print("source_tag ", edge_attr.source_tag, " is not in link", (source, target))
-                return False
+        The source_tag of each segment is validated when it is added (_add_edge),
+        set strict=True to check it again for all segments
+        """
+        if strict:
+            for edge in self._G.edges():
+                source, target, source_tag = edge.source.tag, edge.target.tag, edge.attr.source_tag
+                if source_tag != source and source_tag != target:
+                    print("source_tag ", source_tag, " is not in link", (source, target))
+                    return False
 
-        for tag, node in self.tags_to_nodes.items():
-            if node.num_neighbors() == 0:
-                print("Node %s has no neighbors" % (str(tag)))
-                return False
-            if node.attr.constraint == DisNode.Constraints.PINNED_NODE: continue
-            b_tot = np.zeros(3)
-            for edge in node.edges():
-                b_tot += edge.attr.burg_vec_from(tag)
-            if np.max(np.abs(b_tot)) > tol:
-                print(f"Total Burgers vector from node {tag} is not zero {b_tot}")
-                return False
+        csr_data, ntags = self.get_csr_data()
+        Nnode = len(ntags)
+        num_arms = np.diff(csr_data["indptr"])
+        if np.any(num_arms == 0):
+            tag = list(ntags)[np.argmax(num_arms == 0)]
+            print("Node %s has no neighbors" % (str(tag)))
+            return False
+
+        constraints = np.fromiter((node.attr.constraint for node in self.tags_to_nodes.values()),
+                                  dtype=int, count=Nnode)
+        pinned = constraints == DisNode.Constraints.PINNED_NODE
+        if found_pydis:
+            i = find_unbalanced_node_paradis(csr_data["indptr"], csr_data["burgers"], pinned, tol)
+        elif found_numba:
+            i = find_unbalanced_node_numba(csr_data["indptr"], csr_data["burgers"], pinned, tol)
+        else:
+            # sum Burgers vectors of all arms going out of each node
+            arm_node = np.repeat(np.arange(Nnode), num_arms)
+            b_tot = np.column_stack([np.bincount(arm_node, weights=csr_data["burgers"][:,k], minlength=Nnode)
+                                     for k in range(3)])
+            b_tot[pinned,:] = 0.0
+            not_closed = np.max(np.abs(b_tot), axis=1) > tol
+            i = np.argmax(not_closed) if np.any(not_closed) else -1
+        if i >= 0:
+            b_tot = np.sum(csr_data["burgers"][csr_data["indptr"][i]:csr_data["indptr"][i+1]], axis=0)
+            print(f"Total Burgers vector from node {list(ntags)[i]} is not zero {b_tot}")
+            return False
 
         return True
 
     @staticmethod
     def convert_nodeforce_dict_to_array(state: dict) -> dict:
         nodeforce_dict = state["nodeforce_dict"]
-        state["nodeforces"] = np.array([f for f in nodeforce_dict.values()])
-        state["nodeforcetags"] = np.array([ [domainID, index] for domainID, index in nodeforce_dict.keys()])
+        N = len(nodeforce_dict)
+        state["nodeforces"] = np.array(list(nodeforce_dict.values()), dtype=float).reshape(N, 3)
+        state["nodeforcetags"] = np.array(list(nodeforce_dict), dtype=int).reshape(N, 2)
         return state
 
     @staticmethod
     def convert_nodeforce_array_to_dict(state: dict) -> dict:
         nodeforces = state["nodeforces"]
         nodeforcetags = state["nodeforcetags"]
-        nodeforce_dict = {(nodeforcetags[i][0],nodeforcetags[i][1]): nodeforces[i] for i in range(len(nodeforcetags))}
+        nodeforce_dict = dict(zip(map(tuple, np.asarray(nodeforcetags).tolist()), nodeforces))
         state["nodeforce_dict"] = nodeforce_dict
         return state
 
     @staticmethod
     def convert_nodevel_dict_to_array(state: dict) -> dict:
         nodevel_dict = state["vel_dict"]
-        state["nodevels"] = np.array([v for v in nodevel_dict.values()])
-        state["nodeveltags"] = np.array([ [domainID, index] for domainID, index in nodevel_dict.keys()])
+        N = len(nodevel_dict)
+        state["nodevels"] = np.array(list(nodevel_dict.values()), dtype=float).reshape(N, 3)
+        state["nodeveltags"] = np.array(list(nodevel_dict), dtype=int).reshape(N, 2)
         return state
 
     @staticmethod
     def convert_nodevel_array_to_dict(state: dict) -> dict:
         nodevels = state["nodevels"]
         nodeveltags = state["nodeveltags"]
-        nodevel_dict = {(nodeveltags[i][0],nodeveltags[i][1]): nodevels[i] for i in range(len(nodeveltags))}
+        nodevel_dict = dict(zip(map(tuple, np.asarray(nodeveltags).tolist()), nodevels))
         state["vel_dict"] = nodevel_dict
         return state
@@ -0,0 +1,50 @@
+"""@package docstring
+DisNet_Kernels: compiled kernels for DisNet
+
+Provide numba-compiled loops over the CSR arrays returned by DisNet.get_csr_data
+"""
+
+import numpy as np
+from numba import njit
+
+@njit(cache=True, fastmath=True)
+def find_unbalanced_node(indptr: np.ndarray, burgers: np.ndarray, skip: np.ndarray, tol: float) -> int:
+    """find_unbalanced_node: return index of the first node whose outgoing Burgers vectors
+       do not sum to zero (or -1 if there is none), ignoring nodes with skip[i] == True
+    """
+    Nnode = indptr.shape[0] - 1
+    for i in range(Nnode):
+        if skip[i]:
+            continue
+        bx, by, bz = 0.0, 0.0, 0.0
+        for k in range(indptr[i], indptr[i+1]):
+            bx += burgers[k, 0]
+            by += burgers[k, 1]
+            bz += burgers[k, 2]
+        if abs(bx) > tol or abs(by) > tol or abs(bz) > tol:
+            return i
+    return -1
+
+@njit(cache=True)
+def sort_arms_by_node(arm_node: np.ndarray, Nnode: int):
+    """sort_arms_by_node: counting sort of arms by the index of their node
+       return indptr (arms of node i are order[indptr[i]:indptr[i+1]]) and order,
+       which is the same as np.argsort(arm_node, kind="stable")
+    """
+    Narm = arm_node.shape[0]
+    indptr = np.zeros(Nnode+1, dtype=np.int64)
+    for k in range(Narm):
+        indptr[arm_node[k]+1] += 1
+    for i in range(Nnode):
+        indptr[i+1] += indptr[i]
+    fill = indptr[:-1].copy()
+    order = np.empty(Narm, dtype=np.int64)
+    for k in range(Narm):
+        i = arm_node[k]
+        order[fill[i]] = k
+        fill[i] += 1
+    return indptr, order
+
+# compile at import so that the first sanity check does not pay for it
+find_unbalanced_node(np.zeros(2, dtype=np.int64), np.zeros((0, 3)), np.zeros(1, dtype=np.bool_), 1e-8)
+sort_arms_by_node(np.zeros(0, dtype=np.int64), 1)
@@ -0,0 +1,32 @@
+import numpy as np
+from ctypes import c_double, c_int, POINTER
+
+try:
+    pydis_lib = __import__('pydis_lib')
+    # a pydis_lib built before FindUnbalancedNode was added does not provide it
+    found_pydis = hasattr(pydis_lib, "FindUnbalancedNode")
+except ImportError:
+    found_pydis = False
+    raise
+
+def find_unbalanced_node_paradis(indptr: np.ndarray, burgers: np.ndarray, skip: np.ndarray, tol: float) -> int:
+    """ this finds the first node whose outgoing Burgers vectors do not sum to zero
+    input:
+        indptr      arms of node i are burgers[indptr[i]:indptr[i+1]]
+        burgers     Burgers vectors of the arms, sorted by node (Narm x 3)
+        skip        nodes with skip[i] == True are not checked
+        tol         tolerance on each component of the sum
+    return:
+        index of the first unbalanced node, or -1 if there is none
+    """
+    indptr = np.ascontiguousarray(indptr, dtype=np.intc)
+    burgers = np.ascontiguousarray(burgers, dtype=np.float64)
+    skip = np.ascontiguousarray(skip, dtype=np.intc)
+
+    return pydis_lib.FindUnbalancedNode(
+        c_int(indptr.shape[0] - 1),
+        indptr.ctypes.data_as(POINTER(c_int)),
+        burgers.ctypes.data_as(POINTER(c_double)),
+        skip.ctypes.data_as(POINTER(c_int)),
+        c_double(tol)
+    )
@@ -4,13 +4,14 @@ Topology_DisNet: class for splitting multi nodes
 Provide topology handling functions given a DisNet object
 """
 
+import logging
 import numpy as np
-from copy import deepcopy
-import itertools
 
 from ..disnet import DisNet, DisNode, Tag
 from framework.disnet_manager import DisNetManager
 
+logger = logging.getLogger(__name__)
+
 class Topology:
     """Topology: class for selecting and handling multi node splitting
     """
@@ -34,16 +35,26 @@ class Topology:
         self.Handle_Functions[self.split_mode](G, state)
         return state
 
+    @staticmethod
+    def build_split_matrix(n: int) -> np.ndarray:
+        """build_split_matrix: build a boolean matrix whose rows select the arms of each split
+           there must be at least two True's and at least 2 False's in each row,
+           rows are in the order of itertools.product([True, False], repeat=n)
+        """
+        # the first element must be selected to avoid double counting,
+        # row m of the product with item[0] == True selects index i > 0 iff bit (n-1-i) of m is 0
+        m = np.arange(2**max(n-1, 0))[:,None]
+        shifts = np.arange(n-2, -1, -1)
+        S = np.hstack((np.ones((m.shape[0], 1), dtype=bool), ((m >> shifts) & 1) == 0))
+        num_selected = S.sum(axis=1)
+        return S[(num_selected >= 2) & (num_selected <= n-2)]
+
     @staticmethod
     def build_split_list(n: int) -> list:
         """build_split_list: build a list of length n with True's and False's
            there must be at least two True's and at least 2 False's
         """
-        indices = list(range(n))
-        all_bool_list = list(itertools.product([True, False], repeat=n))
-        # the first element must be selected to avoid double counting
-        selected_list = [list(itertools.compress(indices,item)) for item in all_bool_list if item[0] and sum(item) >= 2 and sum(item) <= n-2]
-        return selected_list
+        return [np.flatnonzero(row).tolist() for row in Topology.build_split_matrix(n)]
 
     @staticmethod
     def init_topology_exemptions(G, state) -> None:
@@ -56,6 +67,18 @@ class Topology:
         state["nodeflag_dict"] = nodeflag_dict
         return state
 
+    @staticmethod
+    def copy_state_for_trial(state: dict) -> dict:
+        """copy_state_for_trial: return a copy of state that a trial split can modify
+           only the entries that force and mobility update are copied,
+           the rest (e.g. applied_stress) is shared with state
+        """
+        state_trial = state.copy()
+        for key in ["nodeforces", "nodevels", "nodeforce_dict", "vel_dict"]:
+            if key in state_trial:
+                state_trial[key] = state_trial[key].copy()
+        return state_trial
+
     @staticmethod
     def split_node_and_update_forces(G, state, tag, pos1, pos2, nbrs_to_split, force, mobility):
         split_node1, split_node2 = G.split_node(tag, pos1, pos2, nbrs_to_split)
@@ -81,40 +104,40 @@ class Topology:
         """
 
         n_degree = G.out_degree(tag)
-        nbrs = list(G.neighbors_tags(tag))
-        nbr_idx_list = Topology.build_split_list(n_degree)
+        nbrs = G.neighbors_tags(tag)
+        split_matrix = Topology.build_split_matrix(n_degree)
 
         power0 = np.dot(state["nodeforce_dict"][tag], state["vel_dict"][tag])
-        #print("trial_split_multi_node (%s): power0 = %e"%(tag, power0))
-        #print("edges = %s"%(str(G.edges(tag))))
+        logger.debug("trial_split_multi_node (%s): power0 = %e", tag, power0)
+        logger.debug("neighbors = %s", nbrs)
 
         pos0 = G.nodes(tag).R
-        n_splits = len(nbr_idx_list)
+        n_splits = split_matrix.shape[0]
         power_diss = np.zeros(n_splits)
         for k in range(n_splits):
-            nbrs_to_split = [nbrs[i] for i in nbr_idx_list[k]]
+            nbrs_to_split = [nbr for nbr, selected in zip(nbrs, split_matrix[k]) if selected]
 
             # make a copy of the network G to make trial splits
             G_trial = G.copy()
-            state_trial = deepcopy(state)
+            state_trial = Topology.copy_state_for_trial(state)
             state_trial, split_node1, split_node2 = Topology.split_node_and_update_forces(G_trial, state_trial, tag, pos0.copy(), pos0.copy(), nbrs_to_split, force, mobility)
 
             power_diss[k] = np.dot(state_trial["nodeforce_dict"][split_node1], state_trial["vel_dict"][split_node1]) \
                           + np.dot(state_trial["nodeforce_dict"][split_node2], state_trial["vel_dict"][split_node2])
 
-            #print("trial_split_multi_node (%s): power_diss[%d] = %e"%(str(tag), k, power_diss[k]))
+            logger.debug("trial_split_multi_node (%s): power_diss[%d] = %e", tag, k, power_diss[k])
 
         # To do: adjust power_th to be consistent with ParaDiS
         if np.max(power_diss) - power0 > power_th:
             # select the split that leads to the maximum power dissipation
             k_sel = np.argmax(power_diss)
             do_split = True
-            #print("trial_split_multi_node (%s): power0 = %e power_diss[%d] = %e"%(str(tag), power0, k_sel, power_diss[k_sel]))
+            logger.debug("trial_split_multi_node (%s): power0 = %e power_diss[%d] = %e", tag, power0, k_sel, power_diss[k_sel])
         else:
             do_split = False
 
         if do_split:
-            nbrs_to_split = [nbrs[i] for i in nbr_idx_list[k_sel]]
+            nbrs_to_split = [nbr for nbr, selected in zip(nbrs, split_matrix[k_sel]) if selected]
             state, split_node1, split_node2 = Topology.split_node_and_update_forces(G, state, tag, pos0.copy(), pos0.copy(), nbrs_to_split, force, mobility)
 
             # Mark both nodes involved in the split as 'exempt' from subsequent collisions this time step
@@ -135,7 +158,11 @@ class Topology:
 
            This function calls the lower level split_node() function.
         """
-        nodes = list(G.all_nodes_tags())
+        # take all degrees at once from the CSR arrays and only visit nodes with at least four arms,
+        # a split does not change the number of arms of the other nodes in the list
+        csr_data, ntags = G.get_csr_data()
+        num_arms = np.diff(csr_data["indptr"])
+        nodes = [tag for tag, n_arms in zip(ntags, num_arms.tolist()) if n_arms >= 4]
         for tag in nodes:
             n_degree = G.out_degree(tag)
 
@@ -37,33 +37,29 @@ class VisualizeNetwork:
         self.bounds = np.array([-0.5*np.diag(G.cell.h), 0.5*np.diag(G.cell.h)]) + G.cell.center()
 
         rn = G.pos_array()
-        p_link = np.empty((0,6))
+        ls = np.empty((0,2,3))
 
         # apply PBC
         rn = G.cell.closest_image(Rref=G.cell.center(), R=rn)
 
         plt.cla()
         if plot_links:
-            for my_tag, node_attr in G.all_nodes_mapping():
-                my_coords = node_attr.R.copy()
-                # apply PBC
-                my_coords = G.cell.closest_image(Rref=G.cell.center(), R=my_coords)
-                for nbr_attr in G.neighbors_dict(my_tag).values():
-                    r_link = np.zeros((2,3))
-                    nbr_coords = nbr_attr.R.copy()
-                    # apply PBC
-                    nbr_coords = G.cell.closest_image(Rref=my_coords, R=nbr_coords)
-                    r_link[0,:] = my_coords
-                    # to do: extend to non-cubic box
-                    r_link[1,:] = nbr_coords
-                    if (not trim) or (
-                        np.min(r_link[:,0]) >= self.bounds[0][0] and np.max(r_link[:,0]) <= self.bounds[1][0] and
-                        np.min(r_link[:,1]) >= self.bounds[0][1] and np.max(r_link[:,1]) <= self.bounds[1][1] and
-                        np.min(r_link[:,2]) >= self.bounds[0][2] and np.max(r_link[:,2]) <= self.bounds[1][2]
-                    ):
-                        p_link = np.append(p_link, [r_link[0,:], r_link[1,:]])
+            segs_data = G.get_segs_data_with_positions()
+            R1, R2 = segs_data["R1"], segs_data["R2"]
+            # R2 is already the closest image of R1, draw each segment next to the image of R1
+            # closest to the center and, if it crosses a periodic boundary, also next to that of R2
+            # compare integer image indices, the shifts themselves carry round-off through hinv and h
+            image1 = G.cell.is_periodic * np.round((R1 - G.cell.center()) @ G.cell.hinv.T)
+            image2 = G.cell.is_periodic * np.round((R2 - G.cell.center()) @ G.cell.hinv.T)
+            crossing = np.any(image1 != image2, axis=1)
+            shift1, shift2 = -image1 @ G.cell.h.T, -image2 @ G.cell.h.T
+            ls = np.concatenate((np.stack((R1 + shift1, R2 + shift1), axis=1),
+                                 np.stack((R1[crossing] + shift2[crossing], R2[crossing] + shift2[crossing]), axis=1)))
+            if trim:
+                # to do: extend to non-cubic box
+                inside = np.all((ls >= self.bounds[0]) & (ls <= self.bounds[1]), axis=(1,2))
+                ls = ls[inside]
 
-        ls = p_link.reshape((-1,2,3))
         lc = Line3DCollection(ls, linewidths=0.5, colors='b')
         ax.add_collection(lc)
 
@@ -24,11 +24,10 @@ def init_frank_read_src_loop(arm_length=1.0, box_length=8.0, burg_vec=np.array([
     rn[:,0:3] += cell.center()
 
     N = rn.shape[0]
-    links = np.zeros((N, 8))
-    for i in range(N):
-        pn = np.cross(burg_vec, rn[(i+1)%N,:3]-rn[i,:3])
-        pn = pn / np.linalg.norm(pn)
-        links[i,:] = np.concatenate(([i, (i+1)%N], burg_vec, pn))
+    idx = np.arange(N)
+    pn = np.cross(burg_vec, rn[(idx+1)%N,:3]-rn[:,:3])
+    pn *= (1.0 / np.sqrt(np.einsum('ij,ij->i', pn, pn)))[:,None]
+    links = np.column_stack((idx, (idx+1)%N, np.tile(burg_vec, (N,1)), pn))
 
     return DisNetManager(DisNet(cell=cell, rn=rn, links=links))
 
@@ -0,0 +1,208 @@
+import numpy as np
+import itertools
+import sys, os
+
+pydis_paths = ['../../python', '../../lib', '../../core/pydis/python']
+[sys.path.append(os.path.abspath(path)) for path in pydis_paths if not path in sys.path]
+
+import pydis.disnet as disnet
+from pydis.disnet import DisNet, DisNode
+from pydis.topology.topology_disnet import Topology
+
+def init_loop_from_file(rn_file, links_file, validate=True):
+    print("init_loop_from_file: rn_file = '%s', links_file = '%s'" % (rn_file, links_file))
+    G = DisNet()
+    rn = np.loadtxt(rn_file)[:, 1:]
+    links = np.loadtxt(links_file)
+    # topological operations copy the plane normals, so provide them
+    links = np.hstack((links, np.tile([0.0, 0.0, 1.0], (links.shape[0], 1))))
+    G.add_nodes_segments_from_list(rn, links, validate=validate)
+    return G
+
+def check_csr(G, name):
+    """check_csr: check the CSR arrays of get_csr_data against the graph
+    """
+    csr_data, ntags = G.get_csr_data(full=True)
+    tags, indptr, indices, seg, rev = (csr_data[key] for key in ("tags", "indptr", "indices", "seg", "rev"))
+    burgers, planes = csr_data["burgers"], csr_data["planes"]
+    Nnode, Nseg = G.num_nodes(), G.num_segments()
+    arm_node = np.repeat(np.arange(Nnode), np.diff(indptr))
+
+    checks = {
+        "shapes": tags.shape == (Nnode, 2) and indptr.shape == (Nnode+1,) and indices.shape == (2*Nseg,)
+                  and seg.shape == (2*Nseg,) and rev.shape == (2*Nseg,)
+                  and burgers.shape == (2*Nseg, 3) and planes.shape == (2*Nseg, 3),
+        "ntags": list(ntags) == [tuple(tag) for tag in tags.tolist()] and list(ntags.values()) == list(range(Nnode)),
+        "indptr": indptr[0] == 0 and np.array_equal(np.diff(indptr), [G.out_degree(tag) for tag in ntags]),
+        "indices": all(sorted(tags[indices[indptr[i]:indptr[i+1]]].tolist()) == sorted(list(nbr) for nbr in G.neighbors_tags(tag))
+                       for tag, i in ntags.items()),
+        "rev": np.array_equal(rev[rev], np.arange(2*Nseg)) and np.array_equal(indices[rev], arm_node)
+               and np.array_equal(seg[rev], seg) and np.all(rev != np.arange(2*Nseg)),
+        "seg": np.array_equal(np.bincount(seg, minlength=Nseg), np.full(Nseg, 2)),
+        "burgers": np.allclose(burgers[rev], -burgers)
+                   and all(np.allclose(burgers[k], G.segments((tuple(tags[arm_node[k]]), tuple(tags[indices[k]]))).burg_vec_from(tuple(tags[arm_node[k]])))
+                           for k in range(2*Nseg)),
+        "planes": np.allclose(planes[rev], planes),
+        "is_sane": G.is_sane() and G.is_sane(strict=True),
+    }
+    failed = [key for key, passed in checks.items() if not passed]
+    print("check_csr: %-24s Nnode = %4d Nseg = %4d %s" % (name, Nnode, Nseg, "ok" if not failed else "failed: %s" % failed))
+    return not failed
+
+def check_cache(G):
+    """check_cache: connectivity is cached until nodes or segments change
+    """
+    indptr = G.get_csr_data()[0]["indptr"]
+    tag = next(iter(G.tags_to_nodes))
+    G.nodes(tag).R = G.nodes(tag).R + 0.1
+    unchanged = G.get_csr_data()[0]["indptr"] is indptr
+    nbr = G.neighbors_tags(tag)[0]
+    G.insert_node_between(tag, nbr, G.get_new_tag(), 0.5*(G.nodes(tag).R + G.nodes(nbr).R))
+    rebuilt = G.get_csr_data()[0]["indptr"] is not indptr
+    print("check_cache: kept after moving a node = %s, rebuilt after inserting a node = %s" % (unchanged, rebuilt))
+    return unchanged and rebuilt
+
+def check_topol_op(G):
+    """check_topol_op: check CSR arrays and sanity after each topological operation
+    """
+    passed = check_csr(G, "initial")
+
+    tag1, tag2 = (0, 0), (0, 1)
+    new_tag = G.get_new_tag()
+    G.insert_node_between(tag1, tag2, new_tag, 0.5*(G.nodes(tag1).R + G.nodes(tag2).R))
+    passed &= check_csr(G, "insert_node_between")
+
+    G.remove_two_arm_node(new_tag)
+    passed &= check_csr(G, "remove_two_arm_node")
+
+    # merge two nodes of different loops into a four-armed node
+    tag3 = (0, 45)
+    loop2_nbrs = G.neighbors_tags(tag3)
+    merged_tag, status = G.merge_node(tag3, tag1)
+    passed &= status == 'MERGE_NODE_SUCCESS' and G.out_degree(merged_tag) == 4
+    passed &= check_csr(G, "merge_node")
+
+    # split the arms of the second loop off again
+    R = G.nodes(merged_tag).R
+    split_node1, split_node2 = G.split_node(merged_tag, R.copy(), R + 0.1, loop2_nbrs)
+    passed &= G.out_degree(split_node1) == 2 and G.out_degree(split_node2) == 2
+    passed &= check_csr(G, "split_node")
+
+    G.merge_node((0, 2), (0, 3))
+    passed &= check_csr(G, "merge_node (neighbors)")
+    return passed
+
+def check_is_sane_options(rn_file, links_file):
+    """check_is_sane_options: validate=False accepts unbalanced input that is_sane() rejects
+    """
+    G = init_loop_from_file(rn_file, links_file, validate=False)
+    passed = G.is_sane()
+
+    # strict=True also checks the source_tag of each segment
+    edge_attr = G.segments(((0, 0), (0, 1)))
+    source_tag = edge_attr.source_tag
+    edge_attr.source_tag = (1, 0)
+    passed &= not G.is_sane(strict=True)
+    edge_attr.source_tag = source_tag
+    passed &= G.is_sane(strict=True)
+
+    edge_attr.burg_vec = 2.0*edge_attr.burg_vec
+    passed &= not G.is_sane()
+
+    # the same network is rejected when validated
+    data = G.export_data()
+    try:
+        DisNet().import_data(data)
+        passed = False
+    except ValueError:
+        pass
+    H = DisNet()
+    H.import_data(data, validate=False)
+    passed &= H.num_segments() == G.num_segments() and not H.is_sane()
+    print("check_is_sane_options: %s" % ("ok" if passed else "failed"))
+    return passed, G
+
+def check_invalid_links(rn_file, links_file):
+    """check_invalid_links: links with node indices out of range are rejected before anything is added
+    """
+    rn = np.loadtxt(rn_file)[:, 1:]
+    links = np.loadtxt(links_file)
+    passed = True
+    for bad_index in (-1, rn.shape[0]):
+        bad_links = links.copy()
+        bad_links[1, 1] = bad_index
+        G = DisNet()
+        try:
+            G.add_nodes_segments_from_list(rn, bad_links)
+            passed = False
+        except ValueError:
+            passed &= G.num_nodes() == 0 and G.num_segments() == 0
+    print("check_invalid_links: %s" % ("ok" if passed else "failed"))
+    return passed
+
+def check_balance_paths(G):
+    """check_balance_paths: the numpy, numba and ParaDiS checks of is_sane agree
+    """
+    found = {"pydis": disnet.found_pydis, "numba": disnet.found_numba}
+    paths = {"numpy": {"pydis": False, "numba": False}}
+    if found["numba"]:
+        paths["numba"] = {"pydis": False, "numba": True}
+    if found["pydis"]:
+        paths["pydis"] = {"pydis": True, "numba": found["numba"]}
+
+    pinned = G.nodes((0, 1))
+    results = {}
+    for name, flags in paths.items():
+        disnet.found_pydis, disnet.found_numba = flags["pydis"], flags["numba"]
+        # unbalanced at (0, 0) and (0, 1), then at (0, 0) only, then balanced
+        results[name] = [G.is_sane()]
+        pinned.constraint = DisNode.Constraints.PINNED_NODE
+        results[name].append(G.is_sane())
+        G.nodes((0, 0)).constraint = DisNode.Constraints.PINNED_NODE
+        results[name].append(G.is_sane())
+        G.nodes((0, 0)).constraint = DisNode.Constraints.UNCONSTRAINED
+        pinned.constraint = DisNode.Constraints.UNCONSTRAINED
+    disnet.found_pydis, disnet.found_numba = found["pydis"], found["numba"]
+
+    passed = all(result == [False, False, True] for result in results.values())
+    print("check_balance_paths: %s %s" % (results, "ok" if passed else "failed"))
+    return passed
+
+def check_split_matrix():
+    """check_split_matrix: compare build_split_matrix with the itertools enumeration
+    """
+    passed = True
+    for n in range(1, 9):
+        ref = [item for item in itertools.product([True, False], repeat=n)
+               if item[0] and 2 <= sum(item) <= n-2]
+        S = Topology.build_split_matrix(n)
+        passed &= S.shape == (len(ref), n) and S.tolist() == [list(item) for item in ref]
+        passed &= Topology.build_split_list(n) == [[i for i in range(n) if item[i]] for item in ref]
+    print("check_split_matrix: %s" % ("ok" if passed else "failed"))
+    return passed
+
+def main():
+    G = init_loop_from_file(rn_file = "loop_rn.dat", links_file = "loop_links.dat")
+
+    passed = check_topol_op(G)
+    passed &= check_cache(G)
+
+    passed_options, G_unbalanced = check_is_sane_options(rn_file = "loop_rn.dat", links_file = "loop_links.dat")
+    passed &= passed_options
+    passed &= check_balance_paths(G_unbalanced)
+    passed &= check_invalid_links(rn_file = "loop_rn.dat", links_file = "loop_links.dat")
+    passed &= check_split_matrix()
+
+    return bool(passed)
+
+
+if __name__ == "__main__":
+    test_passed = main()
+    print("test_passed = %s" % test_passed)
+
+    if test_passed:
+        print("test" + '\033[32m' + " PASSED" + '\033[0m')
+    else:
+        print("test" + '\033[31m' + " FAILED" + '\033[0m')
+
+    exit(0 if test_passed else 1)
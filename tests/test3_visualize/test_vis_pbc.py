@@ -0,0 +1,72 @@
+import numpy as np
+import sys, os
+
+pydis_paths = ['../../python', '../../lib', '../../core/pydis/python']
+[sys.path.append(os.path.abspath(path)) for path in pydis_paths if not path in sys.path]
+
+import matplotlib
+matplotlib.use("Agg")
+
+from pydis.disnet import DisNet, Cell
+from pydis.visualize.vis_disnet import VisualizeNetwork
+
+def init_loop(cell, center, radius, N):
+    """init_loop: circular loop of N nodes in the xy plane, each node wrapped into the cell
+    """
+    theta = np.arange(N)*2.0*np.pi/N
+    R = center + radius*np.column_stack((np.cos(theta), np.sin(theta), np.zeros(N)))
+    R = cell.closest_image(Rref=cell.center(), R=R)
+    rn = np.hstack((R, np.zeros((N, 1))))
+    links = np.zeros((N, 8))
+    links[:,0] = np.arange(N)
+    links[:,1] = (np.arange(N) + 1) % N
+    links[:,2:5] = [1.0, 0.0, 0.0]
+    links[:,5:8] = [0.0, 0.0, 1.0]
+    return DisNet(cell=cell, rn=rn, links=links)
+
+def count_lines(G, trim=False):
+    fig, ax = VisualizeNetwork().plot_disnet(G, trim=trim, pause_seconds=0.001)
+    return len(ax.collections[0].get_segments())
+
+def main():
+    passed = True
+    N = 45
+    # a cell whose h and hinv do not round-trip exactly
+    cell = Cell(h=np.diag([10.7, 9.3, 11.1]), origin=np.array([-5.35, -4.65, -5.55]), is_periodic=[True, True, True])
+
+    # a loop inside the cell is drawn once
+    G = init_loop(cell, center=np.array([0.1, 0.2, 0.3]), radius=3.0, N=N)
+    num_lines = count_lines(G)
+    print("loop inside cell:          %d lines (expected %d)" % (num_lines, N))
+    passed &= num_lines == N
+
+    # a loop across the x boundary crosses it twice, both crossing segments are drawn once more
+    G = init_loop(cell, center=np.array([5.3, 0.2, 0.3]), radius=3.0, N=N)
+    num_lines = count_lines(G)
+    print("loop across x boundary:    %d lines (expected %d)" % (num_lines, N+2))
+    passed &= num_lines == N+2
+
+    # a loop across the x and y boundaries
+    G = init_loop(cell, center=np.array([5.3, 4.6, 0.3]), radius=3.0, N=N)
+    num_lines = count_lines(G)
+    print("loop across x, y boundary: %d lines (expected %d)" % (num_lines, N+4))
+    passed &= num_lines == N+4
+
+    # trimming keeps only the images inside the cell
+    num_lines = count_lines(G, trim=True)
+    print("trimmed:                   %d lines (expected %d)" % (num_lines, N-4))
+    passed &= num_lines == N-4
+
+    return passed
+
+
+if __name__ == "__main__":
+    test_passed = main()
+    print("test_passed = %s" % test_passed)
+
+    if test_passed:
+        print("test" + '\033[32m' + " PASSED" + '\033[0m')
+    else:
+        print("test" + '\033[31m' + " FAILED" + '\033[0m')
+
+    exit(0 if test_passed else 1)